@@ -3,6 +3,7 @@ from typing import Callable, Dict, List, Optional
 from redis import from_url, StrictRedis
 from .config import SLACK_TOKEN
 from .users import getUser
+import logging
 import time
 from slackclient import SlackClient
 
@@ -42,7 +43,17 @@ class SlackBot(SlackClient):
         # notifies all subscribers when command triggers, if condition is true
         for mc in (self._triggers.get(command.trigger, [])):
             if mc.condition(command.event):
-                mc.callback(command)
+                try:
+                    mc.callback(command)
+                except Exception:
+                    # one failing command shouldn't take the websocket down
+                    # with it, or leave the user without a reply
+                    logging.exception('Command %s failed', command.trigger)
+                    self.postMessage(
+                        command.channel,
+                        'Something went wrong.',
+                        command.thread
+                    )
 
     def listen(self):
         # listens for commands, and process them in turn
@@ -61,9 +72,11 @@ class SlackBot(SlackClient):
                 self.rtm_connect()
 
     def _messageEventToCommand(self, event):
+        text = event['text'].lower()
         for trigger in self._triggers.keys():
-            if event['text'].lower().startswith(trigger.lower()):
-                args = event['text'][len(trigger):].strip().lower().split()
+            if text.startswith(trigger.lower()):
+                rest = text[len(trigger):]
+                args = rest.split() if rest else []
                 return Command(
                     trigger,
                     args,
@@ -10,7 +10,8 @@ _USER_CACHE: Dict[str, object] = {}
 def getUser(user_id):
     # store a cache of userId -> userName mappings,
     # so we don't need to make API calls every time
-    if not _USER_CACHE.get(user_id):
-        _USER_CACHE[user_id] = slack.api_call(
+    user = _USER_CACHE.get(user_id)
+    if not user:
+        user = _USER_CACHE[user_id] = slack.api_call(
             'users.info', user=user_id)['user']
-    return _USER_CACHE[user_id]
+    return user
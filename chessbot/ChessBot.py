@@ -3,20 +3,29 @@ from .ai import getMove
 from .analysis import upload_analysis
 from .board import TarraschBoard, TarraschNoBoardException
 from chess import SQUARE_NAMES
-from prettytable import PrettyTable
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import Optional
 
-import json
+import logging
 import time
 
 COOLDOWN_SECONDS = 0
 MP = 'chess'
+# how long a started game waits for both sides to be claimed
+STARTUP_TTL_SECONDS = 60 * 60
+# how many players the leaderboard shows
+LEADERBOARD_SIZE = 20
+# sorted set of every player, scored by total wins
+LEADERBOARD_KEY = 'lb:wins'
 
+_FORFEIT_RESULT = {True: 'loss', False: 'win'}
+
+# lichess uploads run here so a slow upload doesn't hold up the listener
+_EXECUTOR = ThreadPoolExecutor(max_workers=2)
 
-class ChessBot(SlackBot):
-    def __init__(self, token, bot, db):
-        super().__init__(token, bot, db)
-        self.STARTUP_STATE = {}
 
+class ChessBot(SlackBot):
     def onStart(self, cmd: Command):
         """Start a new game."""
         channel, thread = cmd.channel, cmd.thread
@@ -28,15 +37,18 @@ class ChessBot(SlackBot):
         if board:
             return self.postMessage(
                 channel,
-                'A game is already going on in this channel between {} and {}'
-                .format(board.white_user, board.black_user), thread)
-        self.STARTUP_STATE[TarraschBoard.getDbKey(channel, thread)] = {}
+                'A game is already going on in this channel between '
+                f'{board.white_user} and {board.black_user}', thread)
+        # startup state lives in redis, with a ttl so abandoned starts expire
+        key = TarraschBoard.getDbKey(channel, thread)
+        pipe = self.db.pipeline()
+        pipe.delete(_startup_key(key, 'white'), _startup_key(key, 'black'))
+        pipe.setex(_startup_key(key), STARTUP_TTL_SECONDS, 1)
+        pipe.execute()
         self.postMessage(
             channel,
-            (
-                "Let's play chess! I need two players to say" +
-                "{0} claim white or `{0} claim black`."
-            ).format(MP),
+            "Let's play chess! I need two players to say "
+            f"`{MP} claim white` or `{MP} claim black`.",
             thread
         )
 
@@ -48,21 +60,24 @@ class ChessBot(SlackBot):
             cmd.thread,
             cmd.user_name
         )
-        if TarraschBoard.getDbKey(channel, thread) not in self.STARTUP_STATE:
+        key = TarraschBoard.getDbKey(channel, thread)
+        started, white_user, black_user = self.db.mget(
+            _startup_key(key),
+            _startup_key(key, 'white'),
+            _startup_key(key, 'black')
+        )
+        if not started:
             return self.postMessage(
                 channel,
-                'Say `{} start` to start a new game.'.format(MP), thread)
+                f'Say `{MP} start` to start a new game.', thread)
 
         color = args[0].lower()
         ai = args[1] if len(args) > 1 else None  # claim black kasparov
         if color not in ['white', 'black']:
             return self.postMessage(
                 channel,
-                (
-                    'Say `{} claim white` or `{} claim black [ai]`' +
-                    ' to pick your side.'
-                )
-                .format(MP, MP),
+                f'Say `{MP} claim white` or `{MP} claim black [ai]`'
+                ' to pick your side.',
                 thread
             )
 
@@ -70,28 +85,36 @@ class ChessBot(SlackBot):
         if ai == 'kasparov':
             user_name = 'kasparov'
 
-        self.STARTUP_STATE[TarraschBoard.getDbKey(
-            channel, thread)][color] = user_name
+        self.db.setex(
+            _startup_key(key, color), STARTUP_TTL_SECONDS, user_name)
         self.postMessage(
-            channel, '*{}* will play as {}.'.format(user_name, color), thread)
-
-        if 'white' in self.STARTUP_STATE[
-            TarraschBoard.getDbKey(channel, thread)
-        ] and 'black' in self.STARTUP_STATE[
-            TarraschBoard.getDbKey(channel, thread)
-        ]:
-            self._start_game(
-                cmd,
-                self.STARTUP_STATE[TarraschBoard.getDbKey(
-                    channel,
-                    thread)
-                ]['white'],
-                self.STARTUP_STATE[
-                    TarraschBoard.getDbKey(
-                        channel,
-                        thread)
-                ]['black'])
-            del self.STARTUP_STATE[TarraschBoard.getDbKey(channel, thread)]
+            channel, f'*{user_name}* will play as {color}.', thread)
+
+        players = {
+            'white': white_user and white_user.decode('utf-8'),
+            'black': black_user and black_user.decode('utf-8'),
+            color: user_name
+        }
+        if players['white'] and players['black']:
+            self._start_game(cmd, players['white'], players['black'])
+            self.db.delete(
+                _startup_key(key),
+                _startup_key(key, 'white'),
+                _startup_key(key, 'black')
+            )
+
+    def _get_board(self, cmd: Command):
+        """Return the board for the game in this thread, or tell the user
+        how to start one and return None."""
+        try:
+            return TarraschBoard.from_backend(cmd.channel, cmd.thread)
+        except TarraschNoBoardException:
+            self.postMessage(
+                cmd.channel,
+                f'Say `{MP} start` to start a new game.',
+                cmd.thread
+            )
+            return None
 
     def _start_game(self, cmd: Command, white_user: str, black_user: str):
         channel, thread = cmd.channel, cmd.thread
@@ -102,24 +125,25 @@ class ChessBot(SlackBot):
     def _render(self, cmd: Command, board=None):
         channel, thread = cmd.channel, cmd.thread
         if not board:
-            board = TarraschBoard.from_backend(channel, thread)
-        self.postMessage(channel, board.get_url(shorten=True), thread)
-        color = 'white' if board.turn else 'black'
-        user = board.white_user if color == 'white' else board.black_user
+            board = self._get_board(cmd)
+            if board is None:
+                return
+        parts = [board.get_url(shorten=True)]
+        color, user = board.current_color, board.current_turn_username
         if not board.is_game_over():
             message = ''
             if board.move_stack:
                 last_move = board.move_stack[-1]
+                sq = SQUARE_NAMES
                 from_square, to_square = (
-                    SQUARE_NAMES[last_move.from_square],
-                    SQUARE_NAMES[last_move.to_square]
-                )
-                message += 'Last move: {} → {}. '.format(
-                    from_square, to_square)
-            message += '*{}* ({}) to play.'.format(user, color)
+                    sq[last_move.from_square], sq[last_move.to_square])
+                message += f'Last move: {from_square} → {to_square}. '
+            message += f'*{user}* ({color}) to play.'
             if board.is_check():
                 message += ' Check.'
-            self.postMessage(channel, message, thread)
+            parts.append(message)
+        # board and status go out as one message
+        self.postMessage(channel, '\n'.join(parts), thread)
 
     def onBoard(self, cmd: Command):
         """Show the current board state for the game in this channel."""
@@ -133,7 +157,9 @@ class ChessBot(SlackBot):
             cmd.thread,
             cmd.user_name
         )
-        board = TarraschBoard.from_backend(channel, thread)
+        board = self._get_board(cmd)
+        if board is None:
+            return
         if user_name != board.current_turn_username:  # not this person's turn
             return
         if len(args) == 0:
@@ -143,8 +169,8 @@ class ChessBot(SlackBot):
         if time_until_can_move > 1:
             return self.postMessage(
                 channel,
-                'You must wait {} to make a move.'
-                .format(_humanize(time_until_can_move)),
+                f'You must wait {_humanize(time_until_can_move)}'
+                ' to make a move.',
                 thread
             )
 
@@ -171,12 +197,15 @@ class ChessBot(SlackBot):
             cmd.thread,
             cmd.user_name
         )
-        board = TarraschBoard.from_backend(channel, thread)
-        if user_name != board.current_turn_username:
+        board = self._get_board(cmd)
+        if board is None:
+            return
+        current_user = board.current_turn_username
+        if user_name != current_user:
             return self.postMessage(
                 channel,
-                'Only the current player, *{}*, can take back the last move.'
-                .format(board.current_turn_username),
+                f'Only the current player, *{current_user}*,'
+                ' can take back the last move.',
                 thread
             )
         board.pop()
@@ -185,12 +214,12 @@ class ChessBot(SlackBot):
 
     def onForfeit(self, cmd: Command):
         """Forfeit the current game."""
-        channel, thread = cmd.channel, cmd.thread
-        board = TarraschBoard.from_backend(channel, thread)
-        if board.turn:
-            self._handle_game_over(cmd, board, 'loss')
-        else:
-            self._handle_game_over(cmd, board, 'win')
+        board = self._get_board(cmd)
+        if board is None:
+            return
+        # the side to move is the one forfeiting; results are from white's
+        # point of view
+        self._handle_game_over(cmd, board, _FORFEIT_RESULT[board.turn])
 
     def onRecord(self, cmd: Command):
         """Show your record against each of your opponents."""
@@ -199,55 +228,65 @@ class ChessBot(SlackBot):
             cmd.thread,
             cmd.user_name
         )
-        record = self.db.get(user_name)
+        record = self._get_record(user_name)
         if not record:
             return self.postMessage(
                 channel,
-                'User *{}* has not played any games.'.format(user_name),
+                f'User *{user_name}* has not played any games.',
                 thread
             )
-        record = json.loads(str(record))
-        table = PrettyTable(['Opponent', 'Games', 'Wins', 'Losses', 'Draws'])
-        for opponent, results in record.iteritems():
-            table.add_row([
+        rows = [
+            (
                 opponent,
-                results['win'] + results['loss'] +
-                results['draw'],
+                results['win'] + results['loss'] + results['draw'],
                 results['win'],
                 results['loss'],
                 results['draw']
-            ])
-        table_string = table.get_string(sortby='Games', reversesort=True)
+            )
+            for opponent, results in record.items()
+        ]
+        rows.sort(key=itemgetter(1), reverse=True)  # by games
+        table_string = _render_table('Opponent', rows)
         self.postMessage(
             channel,
-            'Record for *{}*\n```\n{}```'.format(user_name, table_string),
+            f'Record for *{user_name}*\n```\n{table_string}```',
             thread
         )
 
     def onLeaderboard(self, cmd: Command):
-        """Show the overall W/L/D for all players."""
+        """Show the overall W/L/D for the top players."""
         channel, thread = cmd.channel, cmd.thread
-        table = PrettyTable(['Player', 'Games', 'Wins', 'Losses', 'Draws'])
-        if self.db.scard('players') == 0:
+        # let redis do the sorting, and only fetch totals for the top.
+        # Every player is in the index: migrate.py backfills it as the
+        # release step on each deploy, and _update_records keeps it current
+        players = [
+            p.decode('utf-8')
+            for p in self.db.zrevrange(
+                LEADERBOARD_KEY, 0, LEADERBOARD_SIZE - 1)
+        ]
+        # totals are kept up to date by _update_record (and backfilled by
+        # migrate.py), fetch them all in a single round-trip
+        pipe = self.db.pipeline(transaction=False)
+        for player in players:
+            pipe.hgetall(_totals_key(player))
+        all_totals = [_decode_totals(t) for t in pipe.execute()]
+        rows = []
+        for player, totals in zip(players, all_totals):
+            if not totals:
+                continue
+            wins, losses, draws = (
+                totals['win'], totals['loss'], totals['draw'])
+            rows.append((player, wins + losses + draws, wins, losses, draws))
+        if not rows:
             return self.postMessage(
                 channel,
                 'No games have been recorded.',
                 thread
             )
-        for player in self.db.smembers('players'):
-            record = self.db.get(player)
-            if not record:
-                continue
-            record = json.loads(str(record))
-            wins, losses, draws = 0, 0, 0
-            for _, results in record.iteritems():
-                wins += results['win']
-                losses += results['loss']
-                draws += results['draw']
-            table.add_row([player, wins + losses + draws, wins, losses, draws])
-        table_string = table.get_string(sortby='Wins', reversesort=True)
+        rows.sort(key=itemgetter(2), reverse=True)  # by wins
+        table_string = _render_table('Player', rows)
         self.postMessage(
-            channel, '```\n{}```'.format(table_string), thread)
+            channel, f'```\n{table_string}```', thread)
 
     def onHelp(self, cmd: Command):
         if cmd.thread is None:
@@ -258,36 +297,33 @@ class ChessBot(SlackBot):
             )
             return
 
-        help_string = "Let's play some chess. " + \
-            "My code is on GitHub at xybotsu/chessbot.\n\n"
-        channel, thread = cmd.channel, cmd.thread
-        for command in sorted(self.COMMANDS.keys()):
-            if command == 'help':
-                continue
-            help_string += '{}: {}\n'.format(
-                command,
-                self.COMMANDS[command].__doc__
-            )
-        help_string += '\nYou can read all about algebraic " + \
-            "notation here: https://goo.gl/OOquFQ\n'
-        self.postMessage(channel, help_string, thread)
+        self.postMessage(cmd.channel, _HELP_STRING, cmd.thread)
 
     def _update_records(self, white_user: str, black_user: str, result: str):
         white_result = 'win' if result == 'win' else 'loss'
         black_result = 'loss' if result == 'win' else 'win'
         if result == 'draw':
             white_result, black_result = 'draw', 'draw'
-        self._update_record(white_user, black_user, white_result)
-        self._update_record(black_user, white_user, black_result)
-        self.db.sadd('players', white_user)
-        self.db.sadd('players', black_user)
-
-    def _update_record(self, user, against, result):
-        record = json.loads(str(self.db.get(user) or {}))
-        if against not in record:
-            record[against] = {'win': 0, 'loss': 0, 'draw': 0}
-        record[against][result] += 1
-        self.db.set(user, json.dumps(record))
+        # everything for one game goes out in a single MULTI, so records,
+        # totals and the wins index can't drift apart
+        pipe = self.db.pipeline()
+        self._update_record(pipe, white_user, black_user, white_result)
+        self._update_record(pipe, black_user, white_user, black_result)
+        pipe.sadd('players', white_user, black_user)
+        pipe.execute()
+
+    def _get_record(self, user):
+        """Return {opponent: {'win': n, 'loss': n, 'draw': n}} for user."""
+        return _decode_record(self.db.hgetall(_record_key(user)))
+
+    def _update_record(self, pipe, user, against, result):
+        # queues the increments on pipe; legacy records and first-time
+        # totals/wins are backfilled by migrate.py, not here
+        pipe.hincrby(_record_key(user), _record_field(against, result), 1)
+        pipe.hincrby(_totals_key(user), result, 1)
+        # incrementing by 0 still adds players without any wins
+        pipe.zincrby(
+            LEADERBOARD_KEY, value=user, amount=1 if result == 'win' else 0)
 
     def _handle_game_over(self, cmd: Command, board, result=None):
         channel, thread = cmd.channel, cmd.thread
@@ -306,13 +342,21 @@ class ChessBot(SlackBot):
         if board.white_user != board.black_user:
             self._update_records(board.white_user, board.black_user, result)
 
-        # Upload game for analysis
-        try:
-            url = upload_analysis(board.get_pgn())
-            message = 'This game is available for analysis at {}'.format(url)
-        except Exception:
-            message = 'There was a problem uploading the game!'
-        self.postMessage(channel, message, thread)
+        # Upload game for analysis in the background, and post the link
+        # whenever it's ready
+        def post_analysis(future):
+            error = future.exception()
+            if error is None:
+                message = ('This game is available for analysis at '
+                           f'{future.result()}')
+            else:
+                logging.error('Uploading game for analysis failed',
+                              exc_info=error)
+                message = 'There was a problem uploading the game!'
+            self.postMessage(channel, message, thread)
+
+        _EXECUTOR.submit(upload_analysis, board.get_pgn()) \
+            .add_done_callback(post_analysis)
 
         board.kill()
         if result != 'draw':
@@ -320,15 +364,14 @@ class ChessBot(SlackBot):
             color = 'white' if result == 'win' else 'black'
             self.postMessage(
                 channel,
-                '*{}* ({}) wins! Say `{} start` to play another game.'
-                .format(winner, color, MP),
+                f'*{winner}* ({color}) wins!'
+                f' Say `{MP} start` to play another game.',
                 thread
             )
         else:
             self.postMessage(
                 channel,
-                "It's a draw! Say `{} start` to play another game."
-                .format(MP),
+                f"It's a draw! Say `{MP} start` to play another game.",
                 thread
             )
 
@@ -345,11 +388,76 @@ class ChessBot(SlackBot):
     }
 
 
+# COMMANDS never changes, so build the help text once at import time
+_HELP_STRING = (
+    "Let's play some chess. My code is on GitHub at xybotsu/chessbot.\n\n" +
+    ''.join(
+        f'{command}: {ChessBot.COMMANDS[command].__doc__}\n'
+        for command in sorted(ChessBot.COMMANDS)
+        if command != 'help'
+    ) +
+    '\nYou can read all about algebraic notation here: '
+    'https://goo.gl/OOquFQ\n'
+)
+
+
 def _humanize(seconds: int) -> str:
     if seconds < 120:
-        return '{} seconds'.format(int(round(seconds)))
+        return f'{int(round(seconds))} seconds'
     elif seconds < 60 * 60 * 2:
-        return '{} minutes'.format(int(round(seconds / 60)))
+        return f'{int(round(seconds / 60))} minutes'
     elif seconds < 60 * 60 * 24:
-        return '{} hours'.format(int(round(seconds / (60 * 60))))
-    return '{} days'.format(int(round(seconds / (60 * 60 * 24))))
+        return f'{int(round(seconds / (60 * 60)))} hours'
+    return f'{int(round(seconds / (60 * 60 * 24)))} days'
+
+
+def _render_table(name_header: str, rows) -> str:
+    # rows are (name, games, wins, losses, draws), already sorted
+    headers = (name_header, 'Games', 'Wins', 'Losses', 'Draws')
+    widths = [len(h) for h in headers]
+    for row in rows:
+        widths = [max(w, len(str(cell))) for w, cell in zip(widths, row)]
+    name_width, games, wins, losses, draws = widths
+    lines = [
+        f'{n:<{name_width}}  {g:>{games}}  {w:>{wins}}  '
+        f'{lost:>{losses}}  {d:>{draws}}'
+        for n, g, w, lost, d in [headers] + rows
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def _startup_key(key: str, color: Optional[str] = None) -> str:
+    return f'startup:{key}:{color}' if color else f'startup:{key}'
+
+
+def _record_key(user: str) -> str:
+    return f'record:{user}'
+
+
+def _record_field(against: str, result: str) -> str:
+    return f'{against}:{result}'
+
+
+def _totals_key(user: str) -> str:
+    return f'totals:{user}'
+
+
+def _decode_record(fields) -> dict:
+    # record hash fields are '<opponent>:<result>', all bytes from hgetall
+    record: dict = {}
+    for field, count in fields.items():
+        against, _, result = field.decode('utf-8').rpartition(':')
+        results = record.setdefault(
+            against, {'win': 0, 'loss': 0, 'draw': 0})
+        results[result] = int(count)
+    return record
+
+
+def _decode_totals(totals) -> dict:
+    # hgetall gives back bytes for both fields and counts
+    if not totals:
+        return {}
+    result = {'win': 0, 'loss': 0, 'draw': 0}
+    for field, count in totals.items():
+        result[field.decode('utf-8')] = int(count)
+    return result
@@ -1,6 +1,7 @@
 import random
 import pickle
 import datetime
+import functools
 
 from chess import Board, SQUARES_180, pgn
 
@@ -76,13 +77,17 @@ class TarraschBoard(Board):
                 render_string += piece.symbol()
             else:
                 render_string += '-'
-        # We add some noise at the end to force Slack to render our shit
-        url = 'http://www.jinchess.com/chessboard/' \
-            + '?s=s&cm=r&ps=alpha-flat&p={}#{}'.format(
-                render_string, random.randint(0, 10000000))
         if shorten:
-            url = shorten_url(url)
-        return url
+            url = _shortened_url_for_placement(render_string)
+        else:
+            url = _board_url(render_string)
+        # We add some noise at the end to force Slack to render our shit.
+        # It goes on after shortening so the short url can be cached.
+        return '{}#{}'.format(url, random.randint(0, 10000000))
+
+    @property
+    def current_color(self):
+        return 'white' if self.turn else 'black'
 
     @property
     def current_turn_username(self):
@@ -102,3 +107,16 @@ class TarraschBoard(Board):
             next = next.add_main_variation(move)
 
         return root.__str__()
+
+
+def _board_url(render_string):
+    return 'http://www.jinchess.com/chessboard/' \
+        + '?s=s&cm=r&ps=alpha-flat&p={}'.format(render_string)
+
+
+@functools.lru_cache(maxsize=1024)
+def _shortened_url_for_placement(render_string):
+    # the diagram only depends on piece placement, so positions that come
+    # up again (every game's opening, takebacks) skip the shortener call
+    return shorten_url(_board_url(render_string))
+
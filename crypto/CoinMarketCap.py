@@ -1,7 +1,8 @@
 from requests import request, Response
 from json import loads, JSONDecoder
 from .models import Listings, Listing, ListingsDecoder
-from typing import Dict, List, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 import os
 import time
 
@@ -26,17 +27,6 @@ class CachedGet:
     def _isOld(self, t: int) -> bool:
         return current_time_ms() - t > self.cache_time_ms
 
-    def _needsCacheRefresh(self, url: str) -> bool:
-        # True if url not in cache OR url is stale in cache
-
-        isNotInCache = url not in self.cache.keys()
-        isStaleInCache = (
-            url in self.cache.keys() and
-            self._isOld(self.cache[url][1])
-        )
-
-        return isNotInCache or isStaleInCache
-
     def request(
         self,
         method: str,
@@ -44,7 +34,9 @@ class CachedGet:
         headers: Dict[str, str],
         params: Dict[str, str]
     ) -> Response:
-        if self._needsCacheRefresh(url):
+        # a single lookup; refresh if url is missing OR stale in cache
+        cached = self.cache.get(url)
+        if cached is None or self._isOld(cached[1]):
             print("cache stale; fetching {url}".format(url=url))
             resp = request(method, url, headers=headers, params=params)
             self.total_api_calls = self.total_api_calls + 1
@@ -52,7 +44,7 @@ class CachedGet:
             self.cache[url] = (resp, current_time_ms())
             return resp
         else:
-            return self.cache[url][0]
+            return cached[0]
 
 
 class CoinMarketCapApi:
@@ -62,8 +54,13 @@ class CoinMarketCapApi:
 
     def __init__(self) -> None:
         self.getter = CachedGet(CoinMarketCapApi.REFRESH_TIME_MS)
+        # decoded listings + prices for the response currently in the cache,
+        # so cache hits don't pay for json decoding on every command
+        self._decoded: Optional[
+            Tuple[Response, Listings, Mapping[str, float]]
+        ] = None
 
-    def getListings(self) -> Listings:
+    def _getDecoded(self) -> Tuple[Listings, Mapping[str, float]]:
         resp = self.getter.request(
             'get',
             CoinMarketCapApi.URL.format(
@@ -76,15 +73,21 @@ class CoinMarketCapApi:
                 "cryptocurrency_type": "coins"
             }
         )
-        return loads(resp.text, cls=ListingsDecoder)
+        if self._decoded is None or self._decoded[0] is not resp:
+            listings = loads(resp.text, cls=ListingsDecoder)
+            # read-only view, so callers can never corrupt the cached prices
+            prices = MappingProxyType({
+                listing.symbol.lower(): listing.quote['USD']["price"]
+                for listing in listings.data
+            })
+            self._decoded = (resp, listings, prices)
+        return self._decoded[1], self._decoded[2]
 
-    def getPrices(self) -> Dict[str, float]:
-        listings = self.getListings().data
-        print(listings[0])
-        return {
-            listing.symbol.lower(): listing.quote['USD']["price"]
-            for listing in listings
-        }
+    def getListings(self) -> Listings:
+        return self._getDecoded()[0]
+
+    def getPrices(self) -> Mapping[str, float]:
+        return self._getDecoded()[1]
 
     def getTopNListings(self, n: int) -> List[Listing]:
         listings = self.getListings().data
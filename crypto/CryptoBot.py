@@ -5,10 +5,12 @@ from .CryptoTrader import (
     Sell,
     User,
     InsufficientFundsError,
-    InsufficientCoinsError
+    InsufficientCoinsError,
+    InvalidCoinError
 )
 from bot.Bot import Bot, Command, SlackBot
-from typing import Dict, List, Union, Optional
+from typing import List, Mapping, Union, Optional
+import math
 import threading
 
 
@@ -36,7 +38,7 @@ class CryptoBot(SlackBot):
         for user in self.trader.getAllUsers():
             self.execute_ifs(user, prices)
 
-    def execute_ifs(self, user: User, prices: Dict[str, float]) -> None:
+    def execute_ifs(self, user: User, prices: Mapping[str, float]) -> None:
         idx = 0
         ifs = user.ifs
         while idx < len(ifs):
@@ -326,13 +328,22 @@ class CryptoBot(SlackBot):
             cmd.channel,
             cmd.thread
         )
+        if len(args) < 2:
+            self.postMessage(
+                channel,
+                "`crypto buy <ticker> <quantity>` is the format you're looking for.",
+                thread
+            )
+            return
+        ticker = args[0].lower()
         try:
-            ticker = args[0].lower()
             quantity = float(args[1])
-        except:
+            if not math.isfinite(quantity) or quantity <= 0:
+                raise ValueError(quantity)
+        except ValueError:
             self.postMessage(
                 channel,
-                "`crypto buy <ticker> <quantity>` is the format you're looking for.",
+                "{q} is not a valid quantity.".format(q=args[1]),
                 thread
             )
             return
@@ -351,12 +362,8 @@ class CryptoBot(SlackBot):
                 "Insufficient funds. Try selling some coins for $!",
                 thread
             )
-        except:
-            self.postMessage(
-                channel,
-                "Something went wrong.",
-                thread
-            )
+        except InvalidCoinError as e:
+            self.postMessage(channel, str(e), thread)
 
     def onSell(self, cmd: Command):
         # crypto sell eth 200
@@ -366,13 +373,22 @@ class CryptoBot(SlackBot):
             cmd.channel,
             cmd.thread
         )
+        if len(args) < 2:
+            self.postMessage(
+                channel,
+                "`crypto sell <ticker> <quantity>` is the format you're looking for.",
+                thread
+            )
+            return
+        ticker = args[0].lower()
         try:
-            ticker = args[0].lower()
             quantity = float(args[1])
-        except:
+            if not math.isfinite(quantity) or quantity <= 0:
+                raise ValueError(quantity)
+        except ValueError:
             self.postMessage(
                 channel,
-                "`crypto sell <ticker> <quantity>` is the format you're looking for.",
+                "{q} is not a valid quantity.".format(q=args[1]),
                 thread
             )
             return
@@ -392,16 +408,12 @@ class CryptoBot(SlackBot):
                 .format(u=user_name, t=ticker, q=quantity),
                 thread
             )
-        except:
-            self.postMessage(
-                channel,
-                "Something went wrong.",
-                thread
-            )
+        except InvalidCoinError as e:
+            self.postMessage(channel, str(e), thread)
 
     def _onLeaderboard(self, channel: str, thread: Optional[str]):
-        png = self.trader.leaderboard()
         try:
+            png = self.trader.leaderboard()
             if self.lastLeaderboard:
                 self.api_call('files.delete', file=self.lastLeaderboard)
                 self.lastLeaderboard = None
@@ -431,11 +443,12 @@ class CryptoBot(SlackBot):
         # example slack command:
         # "crypto price BTC ETH"
         tickers, channel, thread = cmd.args, cmd.channel, cmd.thread
-        res = {
+        wanted = frozenset(t.lower() for t in tickers)
+        res = [
             ticker + ": " + str(price)
             for ticker, price in self.trader.api.getPrices().items()
-            if ticker.lower() in map(lambda t: t.lower(), tickers)
-        }
+            if ticker.lower() in wanted
+        ]
         self.postMessage(channel, _mono(", ".join(res)), thread)
 
     def onTopCoins(self, cmd: Command):
@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 from dataclasses_json import dataclass_json
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Mapping, Tuple, Union
 from typing_extensions import Literal
 from .CoinMarketCap import CachedGet, CoinMarketCapApi
 from collections import defaultdict
@@ -55,7 +55,7 @@ class If:
     condition: Condition
     action: Union[Alert, Buy, Sell]
 
-    def meets_condition(self, prices: Dict[str, float]) -> bool:
+    def meets_condition(self, prices: Mapping[str, float]) -> bool:
         if self.condition.comparator == '&gt;':
             return prices[self.condition.coin] > self.condition.price
         elif self.condition.comparator == '&lt;':
@@ -100,7 +100,7 @@ class User:
             if v != 0.0
         }
 
-    def value(self, prices: Dict[str, float]) -> float:
+    def value(self, prices: Mapping[str, float]) -> float:
         sum = 0.0
         for ticker, quantity in self.portfolio.items():
             sum = sum + prices.get(ticker, 0) * quantity
@@ -152,6 +152,12 @@ class CryptoTrader:
         prices = self.api.getPrices()
         ticker = ticker.lower()
 
+        if (ticker not in prices):
+            raise InvalidCoinError(
+                "Price missing for {ticker}. Try a different coin."
+                .format(ticker=ticker)
+            )
+
         if (
             user.portfolio.get(ticker) and
             user.portfolio[ticker] >= quantity
@@ -4,6 +4,13 @@ from bot.redis import redis
 import unicodedata
 from datetime import datetime
 from crypto.CryptoTrader import User
+from chessbot.ChessBot import (
+    LEADERBOARD_KEY,
+    _decode_record,
+    _record_field,
+    _record_key,
+    _totals_key
+)
 from typing import Dict, List
 
 def get_users(prefix: str) -> List[User]:
@@ -18,6 +25,44 @@ def get_ifs(prefix: str):
   
 get_ifs('cryptoTrader.test.json')
 
+
+def migrate_chess_records() -> None:
+    # move the old json chess records (keyed by bare user name) into
+    # record:<player> hashes of '<opponent>:<result>' counters
+    for player in redis.smembers('players'):
+        player = player.decode('utf-8')
+        legacy = redis.get(player)
+        if not legacy:
+            continue
+        pipe = redis.pipeline()
+        for against, results in json.loads(legacy).items():
+            for result, count in results.items():
+                pipe.hincrby(
+                    _record_key(player), _record_field(against, result), count)
+        pipe.delete(player)
+        pipe.execute()
+
+
+def backfill_chess_stats() -> None:
+    # (re)build totals:<player> and the wins index from each player's
+    # per-opponent record, so ChessBot only ever has to increment them.
+    # Safe to re-run.
+    migrate_chess_records()
+    for player in redis.smembers('players'):
+        player = player.decode('utf-8')
+        totals = {'win': 0, 'loss': 0, 'draw': 0}
+        record = _decode_record(redis.hgetall(_record_key(player)))
+        for results in record.values():
+            for result in totals:
+                totals[result] += results[result]
+        pipe = redis.pipeline()
+        pipe.delete(_totals_key(player))
+        pipe.hmset(_totals_key(player), totals)
+        pipe.zrem(LEADERBOARD_KEY, player)
+        pipe.zincrby(LEADERBOARD_KEY, value=player, amount=totals['win'])
+        pipe.execute()
+
+
 # def delete_all_ifs(prefix: str) -> None:
 #   for account, user in get_game(prefix):
 #     user.ifs = []
@@ -72,3 +117,8 @@ get_ifs('cryptoTrader.test.json')
 # ]
 
 # print(jsons)
+
+
+if __name__ == '__main__':
+    # runs as the heroku release step (see Procfile) on every deploy
+    backfill_chess_stats()